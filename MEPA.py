@@ -20,6 +20,9 @@
 import sys
 import os
 import shlex
+import array
+import bisect
+import functools
 
 # -----------------------
 # Estruturas de programa
@@ -28,58 +31,77 @@ import shlex
 class MepaProgram:
     """
     Representa o programa MEPA carregado em memória.
-    Mantém um dicionário linha_num -> raw_line_text.
+    Mantém um dicionário linha_num -> raw_line_text e a lista ordenada dos
+    números de linha, atualizada incrementalmente (bisect) a cada edição.
+    `version` é incrementado a cada alteração, para que a MepaMachine saiba
+    quando seu bytecode ficou desatualizado.
     """
     def __init__(self):
         self.lines = {}  # linha_num (int) -> raw_line_text
+        self._sorted_linenos = []  # números de linha em ordem crescente
+        self.version = 0
         self.modified = False
         self.filename = None
 
     def set_line(self, lineno: int, raw_text: str):
+        if lineno not in self.lines:
+            bisect.insort(self._sorted_linenos, lineno)
         self.lines[lineno] = raw_text.strip()
+        self.version += 1
         self.modified = True
 
     def del_line(self, lineno: int):
         if lineno in self.lines:
             del self.lines[lineno]
+            del self._sorted_linenos[bisect.bisect_left(self._sorted_linenos, lineno)]
+            self.version += 1
             self.modified = True
             return True
         return False
 
     def del_range(self, li: int, lf: int):
+        i = bisect.bisect_left(self._sorted_linenos, li)
+        j = bisect.bisect_right(self._sorted_linenos, lf)
         removed = []
-        for n in sorted([ln for ln in self.lines.keys() if li <= ln <= lf]):
-            removed.append((n, self.lines[n]))
-            del self.lines[n]
+        for n in self._sorted_linenos[i:j]:
+            removed.append((n, self.lines.pop(n)))
+        del self._sorted_linenos[i:j]
         if removed:
+            self.version += 1
             self.modified = True
         return removed
 
+    def get_sorted_linenos(self):
+        return list(self._sorted_linenos)
+
     def get_sorted_lines(self):
-        return [(ln, self.lines[ln]) for ln in sorted(self.lines.keys())]
+        return [(ln, self.lines[ln]) for ln in self._sorted_linenos]
 
     def clear(self):
         self.lines.clear()
+        self._sorted_linenos.clear()
+        self.version += 1
         self.modified = False
         self.filename = None
 
     def load_from_file(self, path):
         with open(path, 'r', encoding='utf-8') as f:
-            raw = f.readlines()
+            raw = f.read().split('\n')
         self.lines.clear()
         for line in raw:
-            line = line.rstrip("\n")
-            if not line.strip():
+            # Expect the line to start with line number; split(None, 1)
+            # already skips leading whitespace and yields [] for blank lines
+            parts = line.split(None, 1)
+            if not parts:
                 continue
-            # Expect the line to start with line number
-            parts = line.strip().split(None, 1)
             try:
                 lineno = int(parts[0])
-            except Exception:
+            except ValueError:
                 # skip invalid lines
                 continue
-            rest = parts[1] if len(parts) > 1 else ""
-            self.lines[lineno] = rest
+            self.lines[lineno] = parts[1].rstrip() if len(parts) > 1 else ""
+        self._sorted_linenos = sorted(self.lines)
+        self.version += 1
         self.filename = path
         self.modified = False
 
@@ -98,41 +120,162 @@ class MepaProgram:
 # Parser de instruções
 # -----------------------
 
+@functools.lru_cache(maxsize=4096)
 def parse_line_text(raw_text: str):
     """
-    Parse a raw instruction string into (label, instr, args_list, raw_args_text)
+    Parse a raw instruction string into (label, instr, args_tuple, raw_args_text)
     Examples of raw_text:
       "L1: NADA"
       "CRCT 5"
       "L2: CRVL 1"
-    Returns (label_or_None, instr_upper, args_list (strings), raw_args_text)
+    Returns (label_or_None, instr_upper, args_tuple (strings), raw_args_text)
+    The function is pure, so results are memoized by raw_text; args is a
+    tuple so the cached result cannot be mutated by callers.
     """
     text = raw_text.strip()
     label = None
     instr_part = text
 
     # detect label at start: "L1:" or "L1: INPP"
-    if ':' in text:
-        before, after = text.split(':', 1)
+    before, sep, after = text.partition(':')
+    if sep:
         tok = before.strip()
-        if tok and all(c.isalnum() or c == '_' for c in tok):
-            label = tok
+        # '_' -> 'a' mantém a regra "alfanumérico ou _" numa única varredura em C
+        if tok and tok.replace('_', 'a').isalnum():
+            # internado: chaves de self.labels comparam por identidade
+            label = sys.intern(tok)
             instr_part = after.strip()
 
     if not instr_part:
-        return (label, None, [], "")
+        return (label, None, (), "")
 
-    # split instruction and args
-    try:
-        parts = shlex.split(instr_part)
-    except Exception:
+    # split instruction and args; shlex só é necessário quando há aspas
+    if '"' not in instr_part and "'" not in instr_part:
         parts = instr_part.split()
+    else:
+        try:
+            parts = shlex.split(instr_part)
+        except Exception:
+            parts = instr_part.split()
 
     instr = parts[0].upper()
-    args = parts[1:]
+    args = tuple(parts[1:])
     raw_args = " ".join(args)
     return (label, instr, args, raw_args)
 
+# -----------------------
+# Bytecode pré-decodificado
+# -----------------------
+
+OP_INVALID = 0  # linha que não pôde ser decodificada; arg = mensagem de erro
+OP_NADA = 1
+OP_INPP = 2
+OP_PARA = 3
+OP_AMEM = 4
+OP_DMEM = 5
+OP_CRCT = 6
+OP_CRVL = 7
+OP_ARMZ = 8
+OP_SOMA = 9
+OP_SUBT = 10
+OP_MULT = 11
+OP_DIVI = 12
+OP_INVR = 13
+OP_CONJ = 14
+OP_DISJ = 15
+OP_CMME = 16
+OP_CMMA = 17
+OP_CMIG = 18
+OP_CMDG = 19
+OP_CMEG = 20
+OP_CMAG = 21
+OP_DSVS = 22
+OP_DSVF = 23
+OP_IMPR = 24
+
+OPCODES = {
+    "NADA": OP_NADA, "INPP": OP_INPP, "PARA": OP_PARA,
+    "AMEM": OP_AMEM, "DMEM": OP_DMEM,
+    "CRCT": OP_CRCT, "CRVL": OP_CRVL, "ARMZ": OP_ARMZ,
+    "SOMA": OP_SOMA, "SUBT": OP_SUBT, "MULT": OP_MULT, "DIVI": OP_DIVI,
+    "INVR": OP_INVR, "CONJ": OP_CONJ, "DISJ": OP_DISJ,
+    "CMME": OP_CMME, "CMMA": OP_CMMA, "CMIG": OP_CMIG,
+    "CMDG": OP_CMDG, "CMEG": OP_CMEG, "CMAG": OP_CMAG,
+    "DSVS": OP_DSVS, "DSVF": OP_DSVF, "IMPR": OP_IMPR,
+}
+N_OPS = len(OPCODES) + 1  # + OP_INVALID
+
+# retorno de um handler que encerra a execução (PARA)
+HALT = -1
+
+# entradas de um bloco básico interpretado antes de ele ser compilado
+JIT_THRESHOLD = 8  # sem superinstruções: o peephole custa mais do que blocos frios ganham
+
+# instruções com um argumento inteiro
+INT_ARG_OPS = {OP_AMEM, OP_DMEM, OP_CRCT, OP_CRVL, OP_ARMZ}
+# saltos: o argumento (label ou linha) é resolvido para um índice de pc
+BRANCH_OPS = {OP_DSVS, OP_DSVF}
+
+def decode_instruction(instr, args):
+    """
+    Converte o resultado de parse_line_text em uma tupla (opcode, arg).
+    Argumentos inteiros já são convertidos aqui; em saltos o arg continua
+    sendo o texto do alvo e é resolvido depois pela MepaMachine.
+    Erros de decodificação viram OP_INVALID com a mensagem como arg, para
+    serem reportados somente quando a instrução for executada.
+    """
+    if instr is None:
+        return (OP_NADA, None)
+    op = OPCODES.get(instr)
+    if op is None:
+        return (OP_INVALID, f"Instrução desconhecida: {instr}")
+    if op in INT_ARG_OPS or op in BRANCH_OPS:
+        if len(args) != 1:
+            return (OP_INVALID, f"{instr} requer 1 argumento")
+        if op in BRANCH_OPS:
+            return (op, sys.intern(args[0]))
+        try:
+            return (op, int(args[0]))
+        except ValueError as e:
+            return (OP_INVALID, str(e))
+    return (op, None)
+
+# -----------------------
+# Tradução para Python
+# -----------------------
+
+# Código Python gerado para cada opcode, sempre em uma única linha física:
+# a linha do fonte gerado identifica a instrução MEPA quando ocorre um erro.
+# Placeholders: {op}, {arg} e {end} (len(code), usado por PARA para sair).
+# Instruções raras ou cujo erro precisa da mensagem exata delegam ao handler.
+PY_TEMPLATES = {
+    OP_INVALID: "handlers[{op}]({arg!r})",
+    OP_NADA: "pass",
+    OP_INPP: "pass",
+    OP_PARA: "return {end}",
+    OP_AMEM: "handlers[{op}]({arg})",
+    OP_DMEM: "handlers[{op}]({arg})",
+    OP_CRCT: "stack.append({arg})",
+    OP_CRVL: "stack.append(memory[{arg}] if 0 <= {arg} < len(memory) else handlers[{op}]({arg}))",
+    OP_ARMZ: "memory[{arg}] = stack.pop() if 0 <= {arg} < len(memory) else handlers[{op}]({arg})",
+    OP_SOMA: "b = stack.pop(); stack.append(stack.pop() + b)",
+    OP_SUBT: "b = stack.pop(); stack.append(stack.pop() - b)",
+    OP_MULT: "b = stack.pop(); stack.append(stack.pop() * b)",
+    OP_DIVI: "handlers[{op}](None)",
+    OP_INVR: "stack.append(-stack.pop())",
+    OP_CONJ: "b = stack.pop(); stack.append(1 if (stack.pop() != 0 and b != 0) else 0)",
+    OP_DISJ: "b = stack.pop(); stack.append(1 if (stack.pop() != 0 or b != 0) else 0)",
+    OP_CMME: "b = stack.pop(); stack.append(1 if stack.pop() < b else 0)",
+    OP_CMMA: "b = stack.pop(); stack.append(1 if stack.pop() > b else 0)",
+    OP_CMIG: "b = stack.pop(); stack.append(1 if stack.pop() == b else 0)",
+    OP_CMDG: "b = stack.pop(); stack.append(1 if stack.pop() != b else 0)",
+    OP_CMEG: "b = stack.pop(); stack.append(1 if stack.pop() <= b else 0)",
+    OP_CMAG: "b = stack.pop(); stack.append(1 if stack.pop() >= b else 0)",
+    OP_DSVS: "return {arg}",
+    OP_DSVF: "if stack.pop() == 0: return {arg}",
+    OP_IMPR: "print(stack[-1])",
+}
+
 # -----------------------
 # Máquina MEPA (executor)
 # -----------------------
@@ -140,287 +283,488 @@ def parse_line_text(raw_text: str):
 class MepaMachine:
     def __init__(self, program: MepaProgram):
         self.program = program
+        self.handlers = self.build_handlers()
         self.reset_machine_state()
+        self.rebuild_metadata()
+
+    def build_handlers(self):
+        """
+        Monta a tabela de despacho opcode -> método _op_<mnemônico>.
+        Cada handler recebe o arg pré-decodificado e retorna None para seguir
+        para a próxima instrução, o índice de pc do salto, ou HALT.
+        """
+        handlers = [None] * N_OPS
+        handlers[OP_INVALID] = self._op_invalid
+        for name, op in OPCODES.items():
+            handlers[op] = getattr(self, "_op_" + name.lower())
+        return handlers
 
     def reset_machine_state(self):
+        """Zera pilha, memória e estado de execução; o bytecode é mantido."""
+        # A pilha continua sendo uma list com append/pop: um buffer fixo com
+        # sp inteiro lê lixo em vez de falhar quando sp fica negativo (perde
+        # o "Pilha vazia" sem checagens extras), e acesso elemento a elemento
+        # em numpy/array é mais lento que em list no CPython.
         self.stack = []
-        self.memory = []  # list of int, dynamic with AMEM/DMEM
-        self.labels = {}  # label -> lineno
-        self.sorted_lines = []  # list of line numbers sorted
-        self.line_index_map = {}  # lineno -> index in sorted_lines
-        self.pc_index = 0  # index into sorted_lines
+        self.memory = array.array('q')  # int64 sem boxing, dinâmica com AMEM/DMEM
+        self.pc_index = 0  # index into code
         self.debug_mode = False
         self.debug_paused = False
         self.running = False
         self.last_executed_line = None
-        self.rebuild_metadata()
 
+    # ---------- metadados / bytecode ----------
     def rebuild_metadata(self):
-        """Reconstroi sorted_lines, label table e map de indices."""
-        self.sorted_lines = sorted(self.program.lines.keys())
-        self.line_index_map = {ln: i for i, ln in enumerate(self.sorted_lines)}
-        # build labels table scanning each line's label
-        self.labels = {}
-        for ln in self.sorted_lines:
-            raw = self.program.lines[ln]
-            label, instr, args, raw_args = parse_line_text(raw)
-            if label:
-                self.labels[label] = ln
+        """
+        Reconstroi tudo a partir do programa: parseia cada linha uma única vez
+        e em seguida liga labels e saltos (relink). Usado no LOAD; edições de
+        linhas isoladas passam por line_changed/lines_removed.
+        """
+        self.synced_version = self.program.version
+        self.pc_to_lineno = self.program.get_sorted_linenos()  # pc index -> line number
+        self.decoded = [self.decode_line(ln) for ln in self.pc_to_lineno]
+        self.relink()
+
+    def decode_line(self, ln):
+        """Parseia a linha ln e retorna (label, instr, opcode, arg não resolvido)."""
+        label, instr, args, raw_args = parse_line_text(self.program.lines[ln])
+        op, arg = decode_instruction(instr, args)
+        return (label, instr, op, arg)
+
+    def link_instruction(self, ln, entry):
+        """Resolve o alvo de DSVS/DSVF para índice de pc e registra erros."""
+        label, instr, op, arg = entry
+        if op in BRANCH_OPS:
+            target_pc = self.resolve_target(arg)
+            if target_pc is None:
+                op, arg = OP_INVALID, f"{instr}: label/linha {arg} não encontrado"
+            else:
+                arg = target_pc
+        if op == OP_INVALID:
+            self.decode_errors[ln] = arg
+        return (op, arg)
+
+    def relink(self):
+        """
+        Reconstroi line_index_map, tabela de labels e self.code a partir das
+        linhas já decodificadas (self.decoded), sem parsear nada de novo.
+        """
+        self.compiled_blocks = None  # gerados sob demanda em run()
+        # índices de pc mudaram: nenhuma chave (start, end, n, ...) volta a casar
+        self.jit_cache = {}  # conteúdo do bloco -> função compilada
+        self.line_index_map = {ln: i for i, ln in enumerate(self.pc_to_lineno)}  # lineno -> pc index
+        self.labels = {}  # label -> lineno
+        for ln, entry in zip(self.pc_to_lineno, self.decoded):
+            if entry[0]:
+                self.labels[entry[0]] = ln
+        self.decode_errors = {}  # lineno -> mensagem (linhas OP_INVALID)
+        self.code = []  # pc index -> (opcode, arg)
+        for ln, entry in zip(self.pc_to_lineno, self.decoded):
+            self.code.append(self.link_instruction(ln, entry))
+        self._inpp_pc_index = self.scan_for_inpp()
+
+    def scan_for_inpp(self):
+        """Índice de pc do primeiro INPP em self.code, ou None."""
+        for i, (op, _) in enumerate(self.code):
+            if op == OP_INPP:
+                return i
+        return None
+
+    def line_changed(self, ln):
+        """
+        Atualiza o bytecode após program.set_line(ln, ...), decodificando só
+        essa linha. Os saltos só são religados quando algum índice de pc ou
+        label pode ter mudado (inserção fora do fim, label alterado, ou
+        havia alvos não resolvidos que a nova linha pode satisfazer).
+        """
+        if self.synced_version != self.program.version - 1:
+            # houve outras edições não notificadas: não dá para só remendar
+            self.rebuild_metadata()
+            return
+        self.synced_version = self.program.version
+        entry = self.decode_line(ln)
+        self.compiled_blocks = None
+        pos = bisect.bisect_left(self.pc_to_lineno, ln)
+        if pos < len(self.pc_to_lineno) and self.pc_to_lineno[pos] == ln:
+            # linha substituída: índices de pc não mudam
+            old_label, _, old_op, _ = self.decoded[pos]
+            self.decoded[pos] = entry
+            if old_label != entry[0]:
+                self.relink()
+            else:
+                self.decode_errors.pop(ln, None)
+                self.code[pos] = self.link_instruction(ln, entry)
+                if OP_INPP in (old_op, entry[2]):
+                    self._inpp_pc_index = self.scan_for_inpp()
+            return
+        # linha nova
+        self.pc_to_lineno.insert(pos, ln)
+        self.decoded.insert(pos, entry)
+        if pos == len(self.code) and not entry[0] and not self.decode_errors:
+            self.line_index_map[ln] = pos
+            self.code.append(self.link_instruction(ln, entry))
+            self.jit_cache = {}  # n mudou: blocos antigos não casam mais
+            if entry[2] == OP_INPP and self._inpp_pc_index is None:
+                self._inpp_pc_index = pos
+        else:
+            self.relink()
+
+    def lines_removed(self, linenos):
+        """Atualiza o bytecode após program.del_line/del_range, sem re-parsear."""
+        if self.synced_version != self.program.version - 1:
+            self.rebuild_metadata()
+            return
+        self.synced_version = self.program.version
+        for ln in linenos:
+            pos = bisect.bisect_left(self.pc_to_lineno, ln)
+            if pos < len(self.pc_to_lineno) and self.pc_to_lineno[pos] == ln:
+                del self.pc_to_lineno[pos]
+                del self.decoded[pos]
+        self.relink()
+
+    def sync_with_program(self):
+        """
+        Reconstroi o bytecode se o programa foi alterado sem passar por
+        line_changed/lines_removed/rebuild_metadata.
+        """
+        if self.synced_version != self.program.version:
+            self.rebuild_metadata()
 
     def find_pc_for_start(self):
         """Retorna índice do INPP se existir, senão primeiro índice."""
-        for i, ln in enumerate(self.sorted_lines):
-            raw = self.program.lines[ln]
-            _, instr, *_ = parse_line_text(raw)
-            if instr == "INPP":
-                return i
-        return 0 if self.sorted_lines else None
+        if self._inpp_pc_index is not None:
+            return self._inpp_pc_index
+        return 0 if self.code else None
 
     def get_current_line_lnum(self):
-        if 0 <= self.pc_index < len(self.sorted_lines):
-            return self.sorted_lines[self.pc_index]
+        if 0 <= self.pc_index < len(self.pc_to_lineno):
+            return self.pc_to_lineno[self.pc_index]
         return None
 
-    def jump_to_line(self, target):
+    def resolve_target(self, target):
         """
         target can be an integer line number or a label string.
-        Returns True on success, False otherwise.
+        Returns the pc index of the target, or None if it does not exist.
         """
         if isinstance(target, str):
-            # try parse as int first
-            if target.isdigit() or (target.startswith('-') and target[1:].isdigit()):
+            # try parse as int first (one C-level call), then label
+            try:
                 ln = int(target)
-                if ln in self.line_index_map:
-                    self.pc_index = self.line_index_map[ln]
-                    return True
-                else:
-                    return False
-            # try label
-            if target in self.labels:
-                ln = self.labels[target]
-                self.pc_index = self.line_index_map[ln]
-                return True
+            except ValueError:
+                ln = self.labels.get(target)
             else:
-                return False
+                # int() also accepts '+10', '1_0', ...; like isdigit() did,
+                # only plain (optionally '-') digit strings shadow a label
+                if target in self.labels and not target.lstrip('-').isdigit():
+                    ln = self.labels[target]
         elif isinstance(target, int):
-            if target in self.line_index_map:
-                self.pc_index = self.line_index_map[target]
-                return True
-            else:
-                return False
-        return False
+            ln = target
+        else:
+            return None
+        return self.line_index_map.get(ln)
 
     # ---------- helpers ----------
-    def push(self, val):
-        try:
-            val_i = int(val)
-        except:
-            if isinstance(val, bool):
-                val_i = 1 if val else 0
-            else:
-                raise ValueError(f"Valor inválido para empilhar: {val}")
-        self.stack.append(val_i)
-
-    def pop(self):
-        if not self.stack:
-            raise RuntimeError("Pilha vazia")
-        return self.stack.pop()
-
-    def peek(self):
-        if not self.stack:
-            raise RuntimeError("Pilha vazia")
-        return self.stack[-1]
-
     def ensure_memory_index(self, idx):
         if idx < 0:
-            raise IndexError("Endereço de memória negativo")
+            raise RuntimeError("Endereço de memória negativo")
         if idx >= len(self.memory):
-            raise IndexError(f"Endereço de memória {idx} fora do limite (0..{len(self.memory)-1})")
+            raise RuntimeError(f"Endereço de memória {idx} fora do limite (0..{len(self.memory)-1})")
+
+    # ---------- handlers (um por opcode) ----------
+    def _op_invalid(self, arg):
+        # arg traz a mensagem de erro de decodificação
+        raise RuntimeError(arg)
+
+    def _op_nada(self, arg):
+        pass
+
+    def _op_inpp(self, arg):
+        pass
+
+    def _op_para(self, arg):
+        return HALT
+
+    def _op_amem(self, arg):
+        if arg < 0:
+            raise RuntimeError("AMEM argumento inválido")
+        # preenche com zeros direto dos bytes, sem listas intermediárias
+        self.memory.frombytes(bytes(self.memory.itemsize * arg))
+
+    def _op_dmem(self, arg):
+        if arg < 0 or arg > len(self.memory):
+            raise RuntimeError("DMEM argumento inválido")
+        del self.memory[len(self.memory) - arg:]
+
+    def _op_crct(self, arg):
+        self.stack.append(arg)
+
+    def _op_crvl(self, arg):
+        self.ensure_memory_index(arg)
+        self.stack.append(self.memory[arg])
+
+    def _op_armz(self, arg):
+        val = self.stack.pop()
+        if arg < 0:
+            raise RuntimeError("ARMZ índice negativo")
+        if arg >= len(self.memory):
+            raise RuntimeError(f"Endereço de memória {arg} não alocado")
+        try:
+            self.memory[arg] = val
+        except OverflowError:
+            # células são int64; o OverflowError do array viria em inglês
+            raise RuntimeError("ARMZ valor fora do intervalo de 64 bits")
+
+    def _op_soma(self, arg):
+        stk = self.stack
+        b = stk.pop()
+        a = stk.pop()
+        stk.append(a + b)
+
+    def _op_subt(self, arg):
+        stk = self.stack
+        b = stk.pop()
+        a = stk.pop()
+        stk.append(a - b)
+
+    def _op_mult(self, arg):
+        stk = self.stack
+        b = stk.pop()
+        a = stk.pop()
+        stk.append(a * b)
+
+    def _op_divi(self, arg):
+        stk = self.stack
+        b = stk.pop()
+        a = stk.pop()
+        if b == 0:
+            raise RuntimeError("Divisão por zero")
+        stk.append(a // b)
+
+    def _op_invr(self, arg):
+        stk = self.stack
+        stk.append(-stk.pop())
+
+    def _op_conj(self, arg):
+        stk = self.stack
+        b = stk.pop()
+        a = stk.pop()
+        stk.append(1 if (a != 0 and b != 0) else 0)
+
+    def _op_disj(self, arg):
+        stk = self.stack
+        b = stk.pop()
+        a = stk.pop()
+        stk.append(1 if (a != 0 or b != 0) else 0)
+
+    # Comparações: "1 if a < b else 0" é mantido de propósito. No CPython
+    # 3.11 ele é ~2x mais rápido que "(a < b) + 0" e ~5x mais rápido que
+    # "int(a < b)"; o salto condicional é do bytecode, não da CPU.
+    def _op_cmme(self, arg):
+        stk = self.stack
+        b = stk.pop()
+        a = stk.pop()
+        stk.append(1 if a < b else 0)
+
+    def _op_cmma(self, arg):
+        stk = self.stack
+        b = stk.pop()
+        a = stk.pop()
+        stk.append(1 if a > b else 0)
+
+    def _op_cmig(self, arg):
+        stk = self.stack
+        b = stk.pop()
+        a = stk.pop()
+        stk.append(1 if a == b else 0)
+
+    def _op_cmdg(self, arg):
+        stk = self.stack
+        b = stk.pop()
+        a = stk.pop()
+        stk.append(1 if a != b else 0)
+
+    def _op_cmeg(self, arg):
+        stk = self.stack
+        b = stk.pop()
+        a = stk.pop()
+        stk.append(1 if a <= b else 0)
+
+    def _op_cmag(self, arg):
+        stk = self.stack
+        b = stk.pop()
+        a = stk.pop()
+        stk.append(1 if a >= b else 0)
+
+    def _op_dsvs(self, arg):
+        # alvo já resolvido para índice de pc em rebuild_metadata
+        return arg
+
+    def _op_dsvf(self, arg):
+        # Retornar None (segue) ou o alvo já dispensa mexer em pc_index aqui.
+        # A seleção sem "if" via "(arg, None)[cond != 0]" foi medida ~40%
+        # mais lenta no CPython 3.11 (monta a tupla e indexa a cada salto).
+        if self.stack.pop() == 0:
+            return arg
+
+    def _op_impr(self, arg):
+        print(self.stack[-1])
 
     # ---------- execução de uma instrução ----------
+    def runtime_error(self, pc, exc):
+        """Converte a exceção da instrução em pc em 'Erro na linha N: ...'."""
+        # handlers acessam a pilha diretamente; IndexError = pilha vazia
+        if isinstance(exc, IndexError):
+            msg = "Pilha vazia"
+        elif isinstance(exc, OverflowError) and self.code[pc][0] == OP_ARMZ:
+            # ARMZ compilado grava direto no array('q'), sem passar pelo handler
+            msg = "ARMZ valor fora do intervalo de 64 bits"
+        else:
+            msg = str(exc)
+        return RuntimeError(f"Erro na linha {self.pc_to_lineno[pc]}: {msg}")
+
     def execute_current(self):
         """
         Executa a instrução apontada por pc_index.
         Retorna True se deve continuar (não atingiu PARA), False se encontrou PARA (parar).
+        Exceções da instrução são propagadas sem tratamento; quem chama as
+        formata com runtime_error (pc_index ainda aponta para ela).
         """
         ln = self.get_current_line_lnum()
         if ln is None:
             return False
-        raw = self.program.lines[ln]
-        label, instr, args, raw_args = parse_line_text(raw)
+        op, arg = self.code[self.pc_index]
 
         # salvar para exibição
-        self.last_executed_line = (ln, raw)
-
-        advance_pc = True
-
-        try:
-            if instr is None:
-                pass
-            elif instr == "INPP":
-                pass
-
-            elif instr == "AMEM":
-                if len(args) != 1:
-                    raise RuntimeError("AMEM requer 1 argumento")
-                m = int(args[0])
-                if m < 0:
-                    raise RuntimeError("AMEM argumento inválido")
-                self.memory.extend([0]*m)
-
-            elif instr == "DMEM":
-                if len(args) != 1:
-                    raise RuntimeError("DMEM requer 1 argumento")
-                m = int(args[0])
-                if m < 0 or m > len(self.memory):
-                    raise RuntimeError("DMEM argumento inválido")
-                for _ in range(m):
-                    self.memory.pop()
-
-            elif instr == "PARA":
-                return False
-
-            elif instr == "CRCT":
-                if len(args) != 1:
-                    raise RuntimeError("CRCT requer 1 argumento")
-                self.push(int(args[0]))
-
-            elif instr == "CRVL":
-                if len(args) != 1:
-                    raise RuntimeError("CRVL requer 1 argumento")
-                n = int(args[0])
-                self.ensure_memory_index(n)
-                val = self.memory[n]
-                self.push(val)
-
-            elif instr == "ARMZ":
-                if len(args) != 1:
-                    raise RuntimeError("ARMZ requer 1 argumento")
-                n = int(args[0])
-                val = self.pop()
-                if n < 0:
-                    raise RuntimeError("ARMZ índice negativo")
-                if n >= len(self.memory):
-                    raise RuntimeError(f"Endereço de memória {n} não alocado")
-                self.memory[n] = val
-
-            elif instr == "SOMA":
-                b = self.pop()
-                a = self.pop()
-                self.push(a + b)
-
-            elif instr == "SUBT":
-                b = self.pop()
-                a = self.pop()
-                self.push(a - b)
-
-            elif instr == "MULT":
-                b = self.pop()
-                a = self.pop()
-                self.push(a * b)
-
-            elif instr == "DIVI":
-                b = self.pop()
-                a = self.pop()
-                if b == 0:
-                    raise RuntimeError("Divisão por zero")
-                self.push(a // b)
-
-            elif instr == "INVR":
-                a = self.pop()
-                self.push(-a)
-
-            elif instr == "CONJ":
-                b = self.pop()
-                a = self.pop()
-                self.push(1 if (a != 0 and b != 0) else 0)
-
-            elif instr == "DISJ":
-                b = self.pop()
-                a = self.pop()
-                self.push(1 if (a != 0 or b != 0) else 0)
-
-            elif instr == "CMME":
-                b = self.pop()
-                a = self.pop()
-                self.push(1 if a < b else 0)
-
-            elif instr == "CMMA":
-                b = self.pop()
-                a = self.pop()
-                self.push(1 if a > b else 0)
-
-            elif instr == "CMIG":
-                b = self.pop()
-                a = self.pop()
-                self.push(1 if a == b else 0)
-
-            elif instr == "CMDG":
-                b = self.pop()
-                a = self.pop()
-                self.push(1 if a != b else 0)
-
-            elif instr == "CMEG":
-                b = self.pop()
-                a = self.pop()
-                self.push(1 if a <= b else 0)
-
-            elif instr == "CMAG":
-                b = self.pop()
-                a = self.pop()
-                self.push(1 if a >= b else 0)
-
-            elif instr == "DSVS":
-                if len(args) != 1:
-                    raise RuntimeError("DSVS requer 1 argumento")
-                target = args[0]
-                if not self.jump_to_line(target):
-                    raise RuntimeError(f"DSVS: label/linha {target} não encontrado")
-                return True
-
-            elif instr == "DSVF":
-                if len(args) != 1:
-                    raise RuntimeError("DSVF requer 1 argumento")
-                cond = self.pop()
-                if cond == 0:
-                    target = args[0]
-                    if not self.jump_to_line(target):
-                        raise RuntimeError(f"DSVF: label/linha {target} não encontrado")
-                    return True
-
-            elif instr == "NADA":
-                pass
-
-            elif instr == "IMPR":
-                val = self.peek()
-                print(val)
-
-            else:
-                raise RuntimeError(f"Instrução desconhecida: {instr}")
+        self.last_executed_line = (ln, self.program.lines[ln])
 
+        next_pc = self.handlers[op](arg)
+        if next_pc is None:
             self.pc_index += 1
-            return True
-        except Exception as e:
-            raise RuntimeError(f"Erro na linha {ln}: {str(e)}")
+        elif next_pc == HALT:
+            return False
+        else:
+            self.pc_index = next_pc
+        return True
+
+    # ---------- tradução para Python ----------
+    def compile_block(self, start, end):
+        """
+        Traduz code[start:end] para uma função Python bloco(stack, memory)
+        que retorna o pc do próximo bloco. A instrução pc fica na linha
+        pc - start + 2 do fonte, compilado com o nome "<mepa:start>".
+        """
+        n = len(self.code)
+        src = ["def bloco(stack, memory):"]
+        for pc in range(start, end):
+            op, arg = self.code[pc]
+            src.append("    " + PY_TEMPLATES[op].format(op=op, arg=arg, end=n))
+        src.append(f"    return {end}")
+        namespace = {"handlers": self.handlers}
+        exec(compile("\n".join(src), f"<mepa:{start}>", "exec"), namespace)
+        return namespace["bloco"]
+
+    def compile_program(self, start_idx):
+        """
+        Divide o bytecode em blocos básicos (começam no INPP e em cada alvo
+        de salto) e monta compiled_blocks[pc]: a função do bloco que começa
+        em pc, ou None. Todo bloco começa interpretado (block_stub) e só é
+        compilado depois de JIT_THRESHOLD execuções.
+        """
+        leaders = {start_idx}
+        for op, arg in self.code:
+            if op in BRANCH_OPS:
+                leaders.add(arg)
+        leaders = sorted(leaders)
+        self.compiled_blocks = [None] * len(self.code)
+        for start, end in zip(leaders, leaders[1:] + [len(self.code)]):
+            self.compiled_blocks[start] = self.block_stub(start, end)
+
+    def block_stub(self, start, end):
+        """
+        Retorna uma função com a mesma assinatura dos blocos compilados que
+        interpreta code[start:end] pelos handlers e conta suas execuções.
+        Quando o bloco fica quente, ele é compilado (ou reaproveitado de
+        jit_cache, se o mesmo bloco já foi compilado antes de uma edição que
+        não o alterou) e substitui o stub.
+        """
+        code = self.code
+        handlers = self.handlers
+        blocks = self.compiled_blocks
+        n = len(code)
+        count = 0
+
+        def interpretar(stack, memory):
+            nonlocal count
+            count += 1
+            if count > JIT_THRESHOLD:
+                key = (start, end, n, tuple(code[start:end]))
+                fn = self.jit_cache.get(key)
+                if fn is None:
+                    fn = self.jit_cache[key] = self.compile_block(start, end)
+                blocks[start] = fn
+                return fn(stack, memory)
+            pc = start
+            try:
+                while pc < end:
+                    op, arg = code[pc]
+                    next_pc = handlers[op](arg)
+                    if next_pc is None:
+                        pc += 1
+                    elif next_pc == HALT:
+                        return n
+                    else:
+                        return next_pc
+            except Exception:
+                # o traceback não aponta a instrução; run() lê de pc_index
+                self.pc_index = pc
+                raise
+            return end
+
+        return interpretar
+
+    def compiled_error_pc(self, exc, default_pc):
+        """Recupera, pelo traceback, o pc da instrução gerada que falhou."""
+        pc = default_pc
+        tb = exc.__traceback__
+        while tb is not None:
+            filename = tb.tb_frame.f_code.co_filename
+            if filename.startswith("<mepa:"):
+                pc = int(filename[6:-1]) + tb.tb_lineno - 2
+            tb = tb.tb_next
+        return pc
 
     def run(self):
-        """Executa o programa inteiro."""
+        """
+        Executa o programa inteiro.
+        O laço só encadeia blocos básicos (veja compile_program): blocos
+        frios são interpretados e os quentes viram funções Python; pc_index
+        só é atualizado ao sair. O modo debug interpreta via execute_current.
+        """
+        self.sync_with_program()
         self.reset_machine_state()
         start_idx = self.find_pc_for_start()
         if start_idx is None:
             raise RuntimeError("Nenhum código para executar")
-        self.pc_index = start_idx
+        if self.compiled_blocks is None:
+            self.compile_program(start_idx)
+        blocks = self.compiled_blocks
+        stack = self.stack
+        memory = self.memory
+        n = len(self.code)
+        pc = start_idx
         self.running = True
         try:
-            while self.running and self.pc_index < len(self.sorted_lines):
-                continue_exec = self.execute_current()
-                if not continue_exec:
-                    break
+            while pc < n:
+                pc = blocks[pc](stack, memory)
+        except Exception as e:
+            raise self.runtime_error(self.compiled_error_pc(e, self.pc_index), e)
         finally:
+            self.pc_index = pc
             self.running = False
 
     def debug_start(self):
         """Inicia modo debug."""
+        self.sync_with_program()
         self.reset_machine_state()
         start_idx = self.find_pc_for_start()
         if start_idx is None:
@@ -439,13 +783,16 @@ class MepaMachine:
         if not self.debug_mode or not self.running:
             raise RuntimeError("Não está em modo debug")
         
-        if self.pc_index >= len(self.sorted_lines):
+        if self.pc_index >= len(self.code):
             print("Programa finalizado")
             self.debug_mode = False
             self.running = False
             return
 
-        continue_exec = self.execute_current()
+        try:
+            continue_exec = self.execute_current()
+        except Exception as e:
+            raise self.runtime_error(self.pc_index, e)
         
         if not continue_exec:
             print("Programa finalizado (PARA)")
@@ -454,7 +801,7 @@ class MepaMachine:
             return
 
         # Mostra próxima instrução
-        if self.pc_index < len(self.sorted_lines):
+        if self.pc_index < len(self.code):
             ln = self.get_current_line_lnum()
             if ln is not None:
                 raw = self.program.lines[ln]
@@ -493,6 +840,16 @@ class MepaMachine:
 # REPL
 # -----------------------
 
+def report_decode_errors(machine, known=None):
+    """
+    Exibe os erros de decodificação (labels inexistentes, argumentos
+    inválidos, ...) encontrados em rebuild_metadata, para que apareçam já no
+    LOAD/INS/DEL e não só no RUN. Erros já presentes em `known` são omitidos.
+    """
+    for ln, msg in machine.decode_errors.items():
+        if known is None or known.get(ln) != msg:
+            print(f"Aviso: linha {ln}: {msg}")
+
 def repl():
     """Loop principal do REPL."""
     program = MepaProgram()
@@ -546,6 +903,7 @@ def repl():
                     program.load_from_file(filename)
                     machine.rebuild_metadata()
                     print(f"Arquivo '{filename}' carregado com sucesso.")
+                    report_decode_errors(machine)
                 except FileNotFoundError:
                     print(f"Erro: arquivo '{filename}' não encontrado")
                 except Exception as e:
@@ -593,7 +951,9 @@ def repl():
                         print(f"Linha inserida:")
                         print(f"{lineno} {instr_text}")
                     
-                    machine.rebuild_metadata()
+                    known = dict(machine.decode_errors)
+                    machine.line_changed(lineno)
+                    report_decode_errors(machine, known)
                 
                 except ValueError:
                     print("Erro: número de linha inválido")
@@ -611,7 +971,9 @@ def repl():
                         if program.del_line(lineno):
                             print(f"Linha removida:")
                             print(f"{lineno}")
-                            machine.rebuild_metadata()
+                            known = dict(machine.decode_errors)
+                            machine.lines_removed([lineno])
+                            report_decode_errors(machine, known)
                         else:
                             print(f"Erro: Linha {lineno} inexistente")
                     except ValueError:
@@ -631,7 +993,9 @@ def repl():
                             print(f"Linhas removidas:")
                             for ln, text in removed:
                                 print(f"{ln} {text}")
-                            machine.rebuild_metadata()
+                            known = dict(machine.decode_errors)
+                            machine.lines_removed([ln for ln, _ in removed])
+                            report_decode_errors(machine, known)
                         else:
                             print(f"Nenhuma linha encontrada no intervalo {li}-{lf}")
                     